@@ -88,7 +88,7 @@ while getopts 'hi:o:t:c:f:w:m:M:v' OPTION; do
         md_postprocess="./${OPTARG}"
         ;;
     M)
-        md_format="./${OPTARG}"
+        md_format="${OPTARG}"
         ;;
     v)
         verbose=true
@@ -99,7 +99,7 @@ while getopts 'hi:o:t:c:f:w:m:M:v' OPTION; do
   esac
 done
 
-DEBUG=${verobse:=false}
+DEBUG=${verbose:=false}
 
 WIKI_WEB_DIR=${mediawiki_dir:="/var/www/mediawiki/"}
 validate_mediawiki_dir ${WIKI_WEB_DIR}
@@ -111,11 +111,19 @@ DB_LOGIN=$(grep "wgDBuser" ${WIKI_WEB_DIR}/LocalSettings.php | cut -d\" -f2)
 DB_PASS=$(grep '^\$wgDBpassword' ${WIKI_WEB_DIR}/LocalSettings.php | cut -d\" -f2)
 DB_CHARSET=${charset:="binary"}
 
+# Shared connection options for every query below
+MYSQL_OPTS=(--host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PASS} --database=${DB_NAME} --batch --skip-column-names)
+
 TIMEZONE_OFFSET=${timezone:="+02:00"}
 
 DEST_DIR=${out_dir:="./out"}
 validate_out_dir ${DEST_DIR}
 
+# Cache of pandoc conversions, keyed on the page content and conversion
+# settings, so a re-run only converts pages that actually changed.
+CACHE_DIR=${TMPDIR:-/tmp}/mediawiki-2-hugo-cache
+mkdir -p ${CACHE_DIR}
+
 NAME_SPACES=(
     [0]='main'
     [1]='talk'
@@ -136,21 +144,21 @@ NAME_SPACES=(
     )
 
 
-mapfile name_spaces_ids < <(mysql --host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PASS} --database=${DB_NAME} --batch --skip-column-names --execute="\
+mapfile name_spaces_ids < <(mysql "${MYSQL_OPTS[@]}" --execute="\
     SELECT DISTINCT
         page_namespace
     FROM
         page
     ;")
 
-mapfile categories < <(mysql --host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PASS} --database=${DB_NAME} --batch --skip-column-names --execute="\
+mapfile categories < <(mysql "${MYSQL_OPTS[@]}" --execute="\
     SELECT
         *
     FROM
         category
     ;")
 
-mapfile pages < <(mysql --host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PASS} --database=${DB_NAME} --batch --skip-column-names --execute="\
+mapfile pages < <(mysql "${MYSQL_OPTS[@]}" --execute="\
     SELECT
         p.page_id AS "page_id",
         CAST(p.page_title AS ${DB_CHARSET}) AS "page_title",
@@ -172,7 +180,7 @@ mapfile pages < <(mysql --host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PAS
         p.page_is_redirect = 0
     ;")
 
-mapfile redirects < <(mysql --host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PASS} --database=${DB_NAME} --batch --skip-column-names --execute="\
+mapfile redirects < <(mysql "${MYSQL_OPTS[@]}" --execute="\
     SELECT
         CAST(p.page_title AS ${DB_CHARSET}) AS "redirect_title",
         t.old_text AS "redirect_content"
@@ -197,11 +205,13 @@ done
 echo ""
 
 echo "Creation of the output files..."
-for page in "${pages[@]}"; do
-    IFS=$'\t' read -r page_id page_title page_namespace_id revision_id revision_timestamp text_id text_content user_name <<< "${page}"
+process_page(){
+    local page_id page_title page_namespace_id revision_id revision_timestamp text_id text_content user_name
+    local creation_timestamp page_categories page_category out_file cache_file tmp_file
+    IFS=$'\t' read -r page_id page_title page_namespace_id revision_id revision_timestamp text_id text_content user_name <<< "${1}"
 
     # Execute 2 extra SQL queries for the current page
-    creation_timestamp=$(mysql --host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PASS} --database=${DB_NAME} --batch --skip-column-names --execute="\
+    creation_timestamp=$(mysql "${MYSQL_OPTS[@]}" --execute="\
         SELECT
             DATE_FORMAT(MIN(rev_timestamp),'%Y-%m-%dT%H:%i:%s')
         FROM
@@ -209,7 +219,7 @@ for page in "${pages[@]}"; do
         WHERE
             rev_page = ${page_id}
         ;")
-    page_categories=$(mysql --host=${DB_SERV} --user=${DB_LOGIN} --password=${DB_PASS} --database=${DB_NAME} --batch --skip-column-names --execute="\
+    page_categories=$(mysql "${MYSQL_OPTS[@]}" --execute="\
         SELECT
             CAST(cl_to AS ${DB_CHARSET})
         FROM
@@ -221,35 +231,85 @@ for page in "${pages[@]}"; do
 
     # Generate the Front Matters
     echo "  Generate ${out_file}"
-    echo "---"                                                >  ${out_file}
-    echo "title: \"${page_title//_/ }\""                      >> ${out_file}
-    echo "author: ${user_name}"                               >> ${out_file}
-    echo "date: ${creation_timestamp}${TIMEZONE_OFFSET}"      >> ${out_file}
-    echo "lastmod: ${revision_timestamp}${TIMEZONE_OFFSET}"   >> ${out_file}
-    echo "draft: false"                                       >> ${out_file}
-    echo "slug: " >> ${out_file}
-    echo "categories: "                                       >> ${out_file}
-    while read page_category; do
-        echo "  - ${page_category}"                           >> ${out_file}
-    done < <(printf '%s\n' "${page_categories}")
-    echo "tags: "                                             >> ${out_file}
-    echo "aliases: "                                          >> ${out_file}
-    if [[ -n "${extra_frontmatter}" ]]; then
-        cat ${extra_frontmatter}                              >> ${out_file}
-    fi
-    echo "---" >> ${out_file}
+    {
+        echo "---"
+        echo "title: \"${page_title//_/ }\""
+        echo "author: ${user_name}"
+        echo "date: ${creation_timestamp}${TIMEZONE_OFFSET}"
+        echo "lastmod: ${revision_timestamp}${TIMEZONE_OFFSET}"
+        echo "draft: false"
+        echo "slug: "
+        echo "categories: "
+        while read page_category; do
+            echo "  - ${page_category}"
+        done < <(printf '%s\n' "${page_categories}")
+        echo "tags: "
+        echo "aliases: "
+        if [[ -n "${extra_frontmatter}" ]]; then
+            cat ${extra_frontmatter}
+        fi
+        echo "---"
 
-    if [[ ${NAME_SPACES[$page_namespace_id]} == "file" ]]; then
-        # Display the image in the corresponding .md file
-        echo "![${page_title}](images/${page_title//\//-})" >> ${out_file}
-    else
-        # Insert the context formated in MD
-        echo -e "${text_content}" | ${wiki_preprocess} | pandoc --from=mediawiki --to=${md_format} --atx-headers | ${md_postprocess}>> ${out_file}
-    fi
-    echo ""                                                   >> ${out_file}
+        if [[ ${NAME_SPACES[$page_namespace_id]} == "file" ]]; then
+            # Display the image in the corresponding .md file
+            echo "![${page_title}](images/${page_title//\//-})"
+        else
+            # Insert the context formated in MD, converting only on cache miss
+            # The key covers the pre/post-process scripts' contents too, so
+            # editing them invalidates their cached conversions
+            cache_file=${CACHE_DIR}/$({
+                printf '%s\n%s\n%s\n' "${wiki_preprocess}" "${md_postprocess}" "${md_format}"
+                for format_script in ${wiki_preprocess} ${md_postprocess}; do
+                    [[ -f ${format_script} ]] && cat ${format_script}
+                done
+                printf '%s' "${text_content}"
+                } | sha256sum | cut -d' ' -f1).md
+            if [[ -f ${cache_file} ]]; then
+                cat ${cache_file}
+            else
+                # Fill the cache entry with the same temp-then-move step as
+                # out_file below, and only when the whole pipeline succeeded:
+                # a failed or interrupted conversion must not be persisted,
+                # and a parallel job converting identical content must never
+                # read a half-written entry.
+                # BASHPID (not $$, which is the parent's PID in these
+                # backgrounded jobs) keeps the temp file private per job;
+                # expand it once here, outside the pipeline's subshells
+                tmp_file=${cache_file}.${BASHPID}.tmp
+                set -o pipefail
+                if echo -e "${text_content}" | ${wiki_preprocess} | pandoc --from=mediawiki --to=${md_format} --atx-headers | ${md_postprocess} > ${tmp_file}; then
+                    mv ${tmp_file} ${cache_file}
+                    cat ${cache_file}
+                else
+                    # Emit whatever was produced, but don't cache it
+                    cat ${tmp_file}
+                    rm -f ${tmp_file}
+                fi
+                set +o pipefail
+            fi
+        fi
+        echo ""
+    } > ${out_file}.tmp
+    # Move into place in one step, so an interrupted run never leaves a
+    # half-written page behind.
+    mv ${out_file}.tmp ${out_file}
+}
+
+# Each page is independent: run them as background jobs, at most one per
+# CPU at a time, and wait for the stragglers before touching the output.
+MAX_JOBS=$(nproc 2>/dev/null || echo 4)
+for page in "${pages[@]}"; do
+    while [[ $(jobs -rp | wc -l) -ge ${MAX_JOBS} ]]; do
+        wait -n
+    done
+    process_page "${page}" &
 done
+wait
 
 echo "Add alias for each redirect"
+# Group the aliases per target file first, so each file gets rewritten by
+# sed only once instead of once per redirect pointing at it.
+declare -A alias_lines
 for redirect in "${redirects[@]}"; do
     IFS=$'\t' read -r redirect_title redirect_content <<< "${redirect}"
     cleanned_content=$(echo ${redirect_content} | sed -e 's/^#REDIRECT.*\[\[//' | sed -e 's/\]\].*$//' | sed -e 's/ /_/g')
@@ -262,21 +322,22 @@ for redirect in "${redirects[@]}"; do
         redirect_namespace="main"
     fi
     out_file=${DEST_DIR}/${redirect_namespace}/${redirect_page//\//-}.md
+    alias_lines[${out_file}]+="\n  - ${redirect_title}"
+done
+for out_file in "${!alias_lines[@]}"; do
     echo "  Alias for ${out_file}"
-    sed -i -e "s/^aliases: /aliases: \n  - ${redirect_title}/" ${out_file}
+    sed -i -e "s/^aliases: /aliases: ${alias_lines[${out_file}]}/" ${out_file}
 done
 echo ""
 
 echo "Copy the images"
 mkdir -p ${DEST_DIR}/images/
-for ext in png PNG jpg JPG jpeg JPEG gif GIF; do
-    find ${WIKI_WEB_DIR}/images/ -name "*.${ext}" \
-        -not -name "*[0-9]px-*" \
-        -not -path "*/deleted/*" \
-        -not -path "*/temp/*" \
-        -not -path "*/thumb/*" \
-        -not -path "*/archive/*" \
-        -exec cp {} ${DEST_DIR}/images/ \;
-done
+find ${WIKI_WEB_DIR}/images/ \( -iname "*.png" -o -iname "*.jpg" -o -iname "*.jpeg" -o -iname "*.gif" \) \
+    -not -name "*[0-9]px-*" \
+    -not -path "*/deleted/*" \
+    -not -path "*/temp/*" \
+    -not -path "*/thumb/*" \
+    -not -path "*/archive/*" \
+    -exec cp -t ${DEST_DIR}/images/ {} +
 echo ""
 
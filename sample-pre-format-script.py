@@ -5,10 +5,17 @@
 __author__ = "xenlo (Laurent G.)"
 __license__ = "Apache v2.0"
 
-import fileinput
 import re
 import sys
 
+# Compiled once at import time, so each call (and each line) doesn't pay
+# for a pattern lookup or rebuild.
+PREFORM_TXT_REGEX = re.compile(r"^  ", re.MULTILINE)
+PREFORM_BLOCK_REGEX = re.compile(r"^(?:  .*\n?)+", re.MULTILINE)
+CATEGORY_TAG_REGEX = re.compile(r'\[\[Cat[ée]gor.*:[^\]]*]]', re.IGNORECASE)
+CATEGORY_LINE_REGEX = re.compile(r'^(?:\[\[Cat[ée]gor.*:[^\]]*]])+\n',
+                                 re.IGNORECASE | re.MULTILINE)
+
 """
 Walk through the input and replace the 'preformatted text' (starting with 2 spaces) 
 into 'Fixed width text' (<code>…</code>).
@@ -21,38 +28,30 @@ to:
   | systemctl reload myDaemon
   | </code> 
 """
-def render_code_block(lines):
-  preform_txt_regex = re.compile(r"^  ")
-  code_block = []
-  output = []
-  for line in lines:
-    if line.startswith("  "):
-      code_block.append(preform_txt_regex.sub('', line))
-    else:
-      if code_block != []:
-        output.append("<syntaxhighlight lang='shell'>\n")
-        output = output + code_block
-        output.append("</syntaxhighlight>\n")
-        code_block = []
-      output.append(line)
-  return output
+def render_code_block(text):
+  if not text.startswith("  ") and "\n  " not in text:
+    return text
+  def repl(match):
+    block = PREFORM_TXT_REGEX.sub('', match.group(0))
+    if not block.endswith("\n"):
+      block += "\n"
+    return f"<syntaxhighlight lang='shell'>\n{block}</syntaxhighlight>\n"
+  return PREFORM_BLOCK_REGEX.sub(repl, text)
 
 """
 Remove the all 'Category' tags
 """
-def remove_category_tags(lines):
-  output = []
-  for line in lines:
-    line_no_cat = re.sub(r'\[\[Cat[ée]gor.*:[^\]]*]]', r'', line)
-    if line == "\n" or line_no_cat != "\n":
-      output.append(line_no_cat)
-  return output
+def remove_category_tags(text):
+  if "[[" not in text:
+    return text
+  # Lines holding nothing but category tags disappear entirely, then any
+  # remaining inline tags are stripped in place.
+  text = CATEGORY_LINE_REGEX.sub('', text)
+  return CATEGORY_TAG_REGEX.sub('', text)
 
 """ Main """
-lines_buffer = []
-lines_buffer = fileinput.input()
-lines_buffer = render_code_block(lines_buffer)
-lines_buffer = remove_category_tags(lines_buffer)
-for line in lines_buffer:
-  sys.stdout.write(line)
+text = sys.stdin.read()
+text = render_code_block(text)
+text = remove_category_tags(text)
+sys.stdout.write(text)
 